@@ -1,10 +1,6 @@
-from mpf_scrape import fetch_html
-from bs4 import BeautifulSoup
-import pandas as pd
-from io import StringIO
+from mpf_common import load_dfs
 
-html = fetch_html('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
-dfs = pd.read_html(StringIO(html))
+dfs = load_dfs('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
 
 # Get the main table (DataFrame 5)
 df = dfs[5]
@@ -1,9 +1,6 @@
-from mpf_scrape import fetch_html
-import pandas as pd
-from io import StringIO
+from mpf_common import load_dfs
 
-html = fetch_html('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
-dfs = pd.read_html(StringIO(html))
+dfs = load_dfs('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
 df = dfs[5]
 
 # Check a different row - maybe row 10
@@ -22,20 +19,18 @@ for idx, col in enumerate(df.columns):
 # Let's also check if values are actually different across columns in any row
 print('\n\nChecking if 10 Year columns have different values anywhere:')
 cols_10y = [idx for idx, col in enumerate(df.columns) if '10 Year' in str(col[2])]
-for row_idx in range(min(20, len(df))):
-    values = [df.iloc[row_idx, col] for col in cols_10y]
-    if len(set(str(v) for v in values)) > 1:
-        print(f'Row {row_idx}: {values}')
-        break
+differs = df.iloc[:, cols_10y].nunique(axis=1, dropna=False) > 1
+if differs.any():
+    row_idx = differs.idxmax()
+    print(f'Row {row_idx}: {df.iloc[row_idx, cols_10y].tolist()}')
 else:
     print('All rows have identical values across 10 Year columns - these are TRUE duplicates from colspan!')
 
 print('\n\nChecking if Since Launch columns have different values anywhere:')
 cols_sl = [idx for idx, col in enumerate(df.columns) if 'Since' in str(col[2]) and 'Launch' in str(col[2])]
-for row_idx in range(min(20, len(df))):
-    values = [df.iloc[row_idx, col] for col in cols_sl]
-    if len(set(str(v) for v in values)) > 1:
-        print(f'Row {row_idx}: {values}')
-        break
+differs = df.iloc[:, cols_sl].nunique(axis=1, dropna=False) > 1
+if differs.any():
+    row_idx = differs.idxmax()
+    print(f'Row {row_idx}: {df.iloc[row_idx, cols_sl].tolist()}')
 else:
     print('All rows have identical values across Since Launch columns - these are TRUE duplicates from colspan!')
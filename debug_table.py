@@ -1,9 +1,9 @@
-from mpf_scrape import fetch_html
-from bs4 import BeautifulSoup
-import pandas as pd
+from mpf_common import fetch_html, load_dfs
+from bs4 import BeautifulSoup, SoupStrainer
 
 html = fetch_html('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
-soup = BeautifulSoup(html, 'lxml')
+# Only build the <table> subtrees; the rest of the page is never inspected
+soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('table'))
 tables = soup.find_all('table')
 print(f'Found {len(tables)} tables')
 
@@ -26,8 +26,7 @@ for table_idx, table in enumerate(tables):
 
 # Also try pandas
 print('\n\n=== Pandas read_html ===')
-from io import StringIO
-dfs = pd.read_html(StringIO(html))
+dfs = load_dfs('https://mfp.mpfa.org.hk/eng/mpp_list.jsp')
 print(f'Found {len(dfs)} dataframes')
 for i, df in enumerate(dfs):
     print(f'\nDataFrame {i}: Shape {df.shape}')
@@ -0,0 +1,382 @@
+"""
+MPF Fund Data Scraper - shared fetching and table parsing
+Used by both mpf_scrape.py (CSV/Excel) and mpf_scrape_json.py (JSON).
+"""
+
+import hashlib
+import json
+import re
+import time
+from functools import lru_cache
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import charset_normalizer
+import lxml.html
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Language-specific URLs
+URLS = {
+    "zh": "https://mfp.mpfa.org.hk/tch/mpp_list.jsp",  # Traditional Chinese
+    "cn": "https://mfp.mpfa.org.hk/sch/mpp_list.jsp",  # Simplified Chinese
+    "en": "https://mfp.mpfa.org.hk/eng/mpp_list.jsp",  # English
+}
+
+# 'Latest information as of : 31 Oct 2025' / '最新資料截至 2025年10月31日' banner
+_DATE_PHRASE = r"(?:Latest information as of|最新資料截至|最新资料截至)"
+_DATE_VALUE = r"(\d{1,2}\s+[A-Za-z]+\s+\d{4}|\d{4}年\d{1,2}月\d{1,2}日)"
+_DATE_RE = re.compile(_DATE_PHRASE + r"\s*[:：]?\s*" + _DATE_VALUE, re.IGNORECASE)
+# Fallback allowing other text (but no tags) between the phrase and the date
+_LENIENT_DATE_RE = re.compile(_DATE_PHRASE + r"[^<]*?" + _DATE_VALUE, re.IGNORECASE)
+# Non-breaking space entities, matched as plain spaces
+_NBSP_RE = re.compile(r"&(?:nbsp|#160|#xa0);", re.IGNORECASE)
+
+# Shared session: reuses keep-alive connections across fetches and lets
+# urllib3 retry failed requests with exponential backoff
+_SESSION = requests.Session()
+_SESSION.headers["User-Agent"] = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=3, backoff_factor=1.5, status_forcelist=[500, 502, 503, 504]),
+    ),
+)
+
+# On-disk cache for fetched pages (the MPFA data is only updated monthly)
+CACHE_DIR = Path(".cache")
+CACHE_MAX_AGE = 24 * 60 * 60  # seconds
+
+def _cache_path(url: str, suffix: str) -> Path:
+    """Return the cache file path for a URL."""
+    return CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}{suffix}"
+
+def _is_fresh(path: Path) -> bool:
+    """Check whether a cache file exists and is younger than CACHE_MAX_AGE."""
+    try:
+        return time.time() - path.stat().st_mtime < CACHE_MAX_AGE
+    except OSError:
+        return False
+
+def _load_validators(path: Path) -> Dict[str, str]:
+    """Return the If-None-Match / If-Modified-Since headers saved for a cached page."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _get(url: str, timeout: int, headers: Dict[str, str]) -> requests.Response:
+    """GET a URL through the shared session, raising RuntimeError on failure."""
+    try:
+        resp = _SESSION.get(url, timeout=timeout, headers=headers)
+        resp.raise_for_status()
+    except requests.RequestException as exc:
+        raise RuntimeError(f"Failed to fetch HTML from {url}: {exc}") from exc
+    return resp
+
+@lru_cache(maxsize=None)
+def fetch_html(url: str, timeout: int = 30) -> str:
+    """
+    Fetch page HTML through the shared session (browser-like User-Agent, retries).
+    Responses are memoized in-process and cached on disk for CACHE_MAX_AGE; once
+    that expires the page is revalidated with its ETag / Last-Modified.
+    """
+    cache_file = _cache_path(url, ".html")
+    if _is_fresh(cache_file):
+        try:
+            return cache_file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    meta_file = _cache_path(url, ".json")
+    headers = _load_validators(meta_file) if cache_file.exists() else {}
+    resp = _get(url, timeout, headers)
+
+    if resp.status_code == 304:
+        # Unchanged since the cached copy: reuse it and restart its max-age
+        try:
+            html = cache_file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            # The cached copy is gone or unreadable, so download the page in full
+            resp = _get(url, timeout, {})
+        else:
+            try:
+                cache_file.touch()
+            except OSError:
+                pass
+            return html
+
+    # Trust the charset declared in Content-Type; only scan the body with
+    # charset_normalizer when the server omits it or it does not decode
+    html = None
+    if "charset=" in resp.headers.get("Content-Type", "").lower():
+        try:
+            html = resp.content.decode(resp.encoding)
+        except (LookupError, UnicodeDecodeError):
+            pass
+    if html is None:
+        match = charset_normalizer.from_bytes(resp.content).best()
+        html = str(match) if match else resp.content.decode("utf-8", errors="replace")
+
+    validators = {}
+    if resp.headers.get("ETag"):
+        validators["If-None-Match"] = resp.headers["ETag"]
+    if resp.headers.get("Last-Modified"):
+        validators["If-Modified-Since"] = resp.headers["Last-Modified"]
+
+    # The cache is best-effort; an unwritable directory must not fail the scrape
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        cache_file.write_text(html, encoding="utf-8")
+        meta_file.write_text(json.dumps(validators), encoding="utf-8")
+    except OSError:
+        pass
+    return html
+
+@lru_cache(maxsize=None)
+def load_dfs(url: str) -> List[pd.DataFrame]:
+    """
+    Fetch a page and parse every HTML table on it with pandas.
+    The parsed tables are pickled next to the HTML cache so warm runs skip lxml too.
+    """
+    cache_file = _cache_path(url, ".pkl")
+    if _is_fresh(cache_file):
+        try:
+            return pd.read_pickle(cache_file)
+        except Exception:
+            # Truncated, or pickled by an incompatible pandas: parse the page
+            # again and overwrite it
+            pass
+
+    dfs = pd.read_html(StringIO(fetch_html(url)))
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        pd.to_pickle(dfs, cache_file)
+    except OSError:
+        pass
+    return dfs
+
+def extract_update_date(html: str) -> Optional[str]:
+    """
+    Extracts the 'Latest information as of ...' date text.
+    Returns the raw date string (e.g., '31 Oct 2025') or None if not found.
+    """
+    text = _NBSP_RE.sub(" ", html)
+    m = _DATE_RE.search(text) or _LENIENT_DATE_RE.search(text)
+    return m.group(1).strip() if m else None
+
+# Cell texts that pandas.read_html treats as missing values
+_NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
+_WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+
+def _cell_text(cell) -> str:
+    """Return a cell's text with runs of whitespace collapsed (as pd.read_html does)."""
+    return _WHITESPACE_RE.sub(" ", cell.text_content().strip())
+
+def _expand_rows(rows) -> List[List[str]]:
+    """Expand <tr> elements into rows of cell text, copying rowspan/colspan cells."""
+    grid = []
+    pending = []  # (column index, text, rows still to fill) from earlier rowspans
+    for tr in rows:
+        texts = []
+        next_pending = []
+        for cell in tr.xpath("./td|./th"):
+            while pending and pending[0][0] <= len(texts):
+                col, text, left = pending.pop(0)
+                texts.append(text)
+                if left > 1:
+                    next_pending.append((col, text, left - 1))
+            text = _cell_text(cell)
+            rowspan = int(cell.get("rowspan") or 1)
+            for _ in range(int(cell.get("colspan") or 1)):
+                if rowspan > 1:
+                    next_pending.append((len(texts), text, rowspan - 1))
+                texts.append(text)
+        for col, text, left in pending:
+            texts.append(text)
+            if left > 1:
+                next_pending.append((col, text, left - 1))
+        grid.append(texts)
+        pending = next_pending
+    return grid
+
+def _find_main_table(html: str):
+    """Return the <table> element with the most body rows, with hidden cells removed."""
+    tree = lxml.html.fromstring(html)
+    tables = [
+        t for t in tree.xpath("//table")
+        if "display:none" not in t.get("style", "").replace(" ", "")
+    ]
+    if not tables:
+        raise ValueError("No HTML tables were found on the page.")
+    # XPath count() sizes each table in C without building a node list
+    table = max(tables, key=lambda t: t.xpath("count(.//tbody//tr|./tr)"))
+    for el in table.xpath(".//*[@style]"):
+        if "display:none" in el.get("style", "").replace(" ", ""):
+            el.drop_tree()
+    # Line breaks separate words in header cells such as 'MPF<br>Trustee'
+    for br in table.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+    return table
+
+def _header_columns(header: List[List[str]]) -> List[Tuple[str, ...]]:
+    """
+    Build MultiIndex-style column tuples from expanded header rows, naming empty
+    cells 'Unnamed: {i}_level_{j}' and suffixing repeated tuples with '.1', '.2', ...
+    exactly like pd.read_html does.
+    """
+    header = [row for row in header if any(row)]
+    width = max(len(row) for row in header)
+    columns = []
+    counts: Dict[Tuple[str, ...], int] = {}
+    for i in range(width):
+        col = tuple(
+            (row[i] if i < len(row) else "") or f"Unnamed: {i}_level_{level}"
+            for level, row in enumerate(header)
+        )
+        cur_count = counts.get(col, 0)
+        while cur_count > 0:
+            counts[col] = cur_count + 1
+            col = col[:-1] + (f"{col[-1]}.{cur_count}",)
+            cur_count = counts.get(col, 0)
+        counts[col] = cur_count + 1
+        columns.append(col)
+    return columns
+
+def _to_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert columns whose values are all numbers (allowing ',' separators) to numeric dtypes."""
+    # Text cells are object columns on pandas 2 but str columns on pandas >= 3
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        try:
+            df[col] = pd.to_numeric(df[col].str.replace(",", "", regex=False))
+        except ValueError:
+            pass
+    return df
+
+# Canonical names of the basic-info columns, keyed by their exact level-1
+# header text on the Chinese pages
+_BASIC_COLUMN_MAP = {
+    '計劃': 'Scheme', '计划': 'Scheme',
+    '成分基金': 'Constituent Fund',
+    '受託人': 'MPF Trustee', '受托人': 'MPF Trustee',
+    '基金類別': 'Fund Type', '基金类别': 'Fund Type',
+    '推出日期': 'Launch Date',
+    '風險級別': 'Risk Class', '风险级别': 'Risk Class',
+    '詳細內容': 'Details', '详细内容': 'Details',
+}
+
+# Header fragments (lower-cased, whitespace removed) that identify a basic-info
+# column anywhere in its label; checked in order when the exact lookup misses
+_BASIC_COLUMN_FRAGMENTS = (
+    ('scheme', 'Scheme'),
+    ('constituentfund', 'Constituent Fund'),
+    ('mpftrustee', 'MPF Trustee'),
+    ('fundtype', 'Fund Type'),
+    ('launchdate', 'Launch Date'),
+    ("fundsize(hkd'm)", "Fund size (HKD' m)"), ('基金規模', "Fund size (HKD' m)"), ('基金规模', "Fund size (HKD' m)"),
+    ('riskclass', 'Risk Class'),
+    ('latestfer', 'Latest FER (%)'), ('最近期基金', 'Latest FER (%)'),
+    ('開支比率', 'Latest FER (%)'), ('开支比率', 'Latest FER (%)'),
+    ('details', 'Details'),
+)
+
+@lru_cache(maxsize=None)
+def _basic_column_name(label: str) -> Optional[str]:
+    """Return the canonical basic-info column name for a level-1 header label, or None."""
+    name = _BASIC_COLUMN_MAP.get(label)
+    if name:
+        return name
+    key = "".join(label.split()).lower()
+    for fragment, name in _BASIC_COLUMN_FRAGMENTS:
+        if fragment in key:
+            return name
+    return None
+
+def _split_rows(table) -> Tuple[list, list]:
+    """Return a table's header and body <tr> elements."""
+    header_rows = table.xpath(".//thead/tr")
+    body_rows = table.xpath(".//tbody//tr|./tr") + table.xpath(".//tfoot//tr")
+    if not header_rows:
+        # No <thead>: the leading all-<th> rows form the header
+        while body_rows and all(c.tag == "th" for c in body_rows[0].xpath("./td|./th")):
+            header_rows.append(body_rows.pop(0))
+    return header_rows, body_rows
+
+def main_table_header(html: str) -> Tuple[List[Tuple[str, ...]], int]:
+    """
+    Return the main table's column tuples (as pd.read_html would name them) and
+    its number of body rows, without reading any body cells.
+    """
+    header_rows, body_rows = _split_rows(_find_main_table(html))
+    return _header_columns(_expand_rows(header_rows)), len(body_rows)
+
+def parse_table(html: str, return_column_name: Callable[[str, str, str], Optional[str]]) -> pd.DataFrame:
+    """
+    Parse the fund information table with multi-level headers.
+    Basic-info columns are recognised here; every other column is offered to
+    return_column_name(level_0, level_1, level_2), which returns the output
+    column name or None to drop it.
+    Returns a DataFrame with the kept columns and completely empty rows removed.
+    """
+    # Walk the main table with lxml directly instead of building DataFrames
+    # for every table on the page via pd.read_html
+    header_rows, body_rows = _split_rows(_find_main_table(html))
+    
+    # The table has 3-level MultiIndex columns due to HTML colspan/rowspan
+    # We need to identify which columns are the "real" data columns vs duplicates
+    
+    columns_to_keep = []
+    column_names = []
+    
+    # Clean up the header strings once, before classifying the columns
+    levels = [
+        (str(level_0).strip(), str(level_1).strip(), str(level_2).strip())
+        for level_0, level_1, level_2 in _header_columns(_expand_rows(header_rows))
+    ]
+    
+    for idx, (level_0, level_1, level_2) in enumerate(levels):
+        # Skip columns that are all unnamed (spacers)
+        if 'Unnamed' in level_0 and 'Unnamed' in level_1 and 'Unnamed' in level_2:
+            continue
+        
+        # For basic info columns, keep the one with proper label in level_1
+        # Multi-language support: en/zh/cn
+        name = _basic_column_name(level_1) or return_column_name(level_0, level_1, level_2)
+        if name:
+            columns_to_keep.append(idx)
+            column_names.append(name)
+    
+    if not columns_to_keep:
+        raise ValueError("No recognised columns were found in the main table.")
+    
+    # Build the DataFrame from the kept columns only
+    arr = np.array(
+        [
+            [row[i] if i < len(row) and row[i] not in _NA_VALUES else np.nan for i in columns_to_keep]
+            for row in _expand_rows(body_rows)
+        ],
+        dtype=object,
+    ).reshape(-1, len(columns_to_keep))
+    
+    # Mask of rows that are not completely empty, computed on the raw array.
+    # Types are inferred before filtering so blank rows still yield float columns
+    # exactly as pd.read_html did
+    non_empty = (~pd.isna(arr)).any(axis=1)
+    df_clean = _to_numeric_columns(pd.DataFrame(arr, columns=column_names))
+    
+    return df_clean[non_empty].reset_index(drop=True)
@@ -6,23 +6,17 @@ Scrapes data from all three languages and outputs combined JSON.
 
 import argparse
 import json
+import numbers
 import re
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from io import StringIO
-from typing import Optional, Dict, List, Tuple
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
 
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-# Language-specific URLs
-URLS = {
-    "zh": "https://mfp.mpfa.org.hk/tch/mpp_list.jsp",  # Traditional Chinese
-    "cn": "https://mfp.mpfa.org.hk/sch/mpp_list.jsp",  # Simplified Chinese
-    "en": "https://mfp.mpfa.org.hk/eng/mpp_list.jsp",  # English
-}
+
+from mpf_common import URLS, extract_update_date, fetch_html, parse_table
 
 LANGUAGE_LABELS = {
     "en": "english",
@@ -30,72 +24,8 @@ LANGUAGE_LABELS = {
     "cn": "simplified_chinese",
 }
 
-def fetch_html(url: str, timeout: int = 30, max_retries: int = 3) -> str:
-    """Fetch page HTML with a browser-like User-Agent and basic retries."""
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0 Safari/537.36"
-        )
-    }
-    last_exc = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = requests.get(url, headers=headers, timeout=timeout)
-            resp.raise_for_status()
-            resp.encoding = resp.apparent_encoding or "utf-8"
-            return resp.text
-        except Exception as exc:
-            last_exc = exc
-            time.sleep(1.5 * attempt)  # backoff
-    raise RuntimeError(f"Failed to fetch HTML after {max_retries} attempts: {last_exc}")
-
-def extract_update_date(html: str) -> Optional[str]:
-    """
-    Extracts the 'Latest information as of ...' date text.
-    Returns the raw date string (e.g., '31 Oct 2025') or None if not found.
-    """
-    soup = BeautifulSoup(html, "lxml")
-
-    # Strategy 1: look for an element containing the phrase
-    PHRASES = [
-        "Latest information as of",
-        "最新資料截至",   # Traditional Chinese (fallback)
-    ]
-    text_candidates = []
-
-    # Collect text from common containers
-    for tag in soup.find_all(string=True):
-        t = tag.strip()
-        if not t:
-            continue
-        if any(p.lower() in t.lower() for p in PHRASES):
-            text_candidates.append(t)
-
-    # If found, parse with regex to isolate the date portion
-    for t in text_candidates:
-        # English date like '31 Oct 2025' or '31 October 2025'
-        m_en = re.search(r"Latest information as of\s*:\s*(\d{1,2}\s+[A-Za-z]+(?:[a-z]+)?\s+\d{4})", t, re.IGNORECASE)
-        if m_en:
-            return m_en.group(1).strip()
-
-        # Another common English pattern without colon
-        m_en2 = re.search(r"Latest information as of\s*(\d{1,2}\s+[A-Za-z]+(?:[a-z]+)?\s+\d{4})", t, re.IGNORECASE)
-        if m_en2:
-            return m_en2.group(1).strip()
-
-        # Chinese pattern example: '最新資料截至 2025年10月31日'
-        m_zh = re.search(r"最新資料截至[:：]?\s*(\d{4}年\d{1,2}月\d{1,2}日)", t)
-        if m_zh:
-            return m_zh.group(1).strip()
-
-    # Strategy 2: fallback—search the raw HTML text
-    m_raw = re.search(r"Latest information as of[^<]*?(\d{1,2}\s+[A-Za-z]+(?:[a-z]+)?\s+\d{4})", html, re.IGNORECASE)
-    if m_raw:
-        return m_raw.group(1).strip()
-
-    return None
+# Calendar year in a return column's level-0 header
+_YEAR_RE = re.compile(r'(202[0-4])')
 
 def parse_main_table(html: str) -> pd.DataFrame:
     """
@@ -103,103 +33,34 @@ def parse_main_table(html: str) -> pd.DataFrame:
     Supports English, Traditional Chinese, and Simplified Chinese.
     Returns a DataFrame with cleaned, properly labeled columns and no duplicates.
     """
-    # read_html returns a list of DataFrames
-    tables = pd.read_html(StringIO(html), flavor="lxml")
-    if not tables:
-        raise ValueError("No HTML tables were found on the page.")
-
-    # Find the table with the most rows (main data table)
-    df = max(tables, key=lambda t: len(t))
-    
-    # The table has 3-level MultiIndex columns due to HTML colspan/rowspan
-    # We need to identify which columns are the "real" data columns vs duplicates
-    
-    columns_to_keep = []
-    column_names = []
     seen_return_periods = {}  # Track which return period columns we've already added
     
-    for idx, col_tuple in enumerate(df.columns):
-        level_0, level_1, level_2 = col_tuple
-        
-        # Clean up the strings
-        level_0 = str(level_0).strip()
-        level_1 = str(level_1).strip()
-        level_2 = str(level_2).strip()
-        
-        # Strategy: Keep columns where level_1 or level_2 has meaningful names
-        # Skip unnamed spacer columns
-        
-        # Skip columns that are all unnamed (spacers)
-        if 'Unnamed' in level_0 and 'Unnamed' in level_1 and 'Unnamed' in level_2:
-            continue
-        
-        # For basic info columns, keep the one with proper label in level_1
-        # Multi-language support: en/zh/cn
-        if 'Scheme' in level_1 or level_1 == '計劃' or level_1 == '计划':
-            columns_to_keep.append(idx)
-            column_names.append('Scheme')
-        elif ('Constituent' in level_1 and 'Fund' in level_1) or level_1 == '成分基金':
-            columns_to_keep.append(idx)
-            column_names.append('Constituent Fund')
-        elif 'MPF Trustee' in level_1 or 'MPFTrustee' in level_1 or level_1 == '受託人' or level_1 == '受托人':
-            columns_to_keep.append(idx)
-            column_names.append('MPF Trustee')
-        elif 'Fund  Type' in level_1 or 'Fund Type' in level_1 or level_1 == '基金類別' or level_1 == '基金类别':
-            columns_to_keep.append(idx)
-            column_names.append('Fund Type')
-        elif 'Launch Date' in level_1 or level_1 == '推出日期':
-            columns_to_keep.append(idx)
-            column_names.append('Launch Date')
-        elif "Fund size (HKD' m)" in level_1 or '基金規模' in level_1 or '基金规模' in level_1:
-            columns_to_keep.append(idx)
-            column_names.append("Fund size (HKD' m)")
-        elif 'Risk  Class' in level_1 or 'Risk Class' in level_1 or level_1 == '風險級別' or level_1 == '风险级别':
-            columns_to_keep.append(idx)
-            column_names.append('Risk Class')
-        elif 'Latest FER' in level_1 or '最近期基金' in level_1 or '開支比率' in level_1 or '开支比率' in level_1:
-            columns_to_keep.append(idx)
-            column_names.append('Latest FER (%)')
-        elif 'Details' in level_1 or level_1 == '詳細內容' or level_1 == '详细内容':
-            columns_to_keep.append(idx)
-            column_names.append('Details')
-        
+    def return_column_name(level_0: str, level_1: str, level_2: str) -> Optional[str]:
         # For Calendar Year returns, we look at level_0 which contains year info
         # Check if this is a calendar year column (2024, 2023, 2022, 2021, 2020)
-        elif any(year in level_0 for year in ['2024', '2023', '2022', '2021', '2020']):
-            # Extract the year from level_0
-            year_match = re.search(r'(202[0-4])', level_0)
-            if year_match:
-                year = year_match.group(1)
-                col_key = f'CY_{year}'
-                if col_key not in seen_return_periods:
-                    columns_to_keep.append(idx)
-                    column_names.append(f'Calendar Year Return (%)\n-  {year}')
-                    seen_return_periods[col_key] = True
+        year_match = _YEAR_RE.search(level_0)
+        if year_match:
+            year = year_match.group(1)
+            col_key = f'CY_{year}'
+            if col_key not in seen_return_periods:
+                seen_return_periods[col_key] = True
+                return f'Calendar Year Return (%)\n-  {year}'
+        return None
     
-    # Select only the columns we want to keep
-    df_clean = df.iloc[:, columns_to_keep].copy()
-    df_clean.columns = column_names
-    
-    # Drop rows that are completely empty
-    df_clean = df_clean.dropna(how='all')
-    
-    # Reset index
-    df_clean = df_clean.reset_index(drop=True)
-    
-    return df_clean
+    return parse_table(html, return_column_name)
+
+# Columns reformatted for the JSON output
+_FUND_SIZE_COL = "Fund size (HKD' m)"
+_CALENDAR_YEAR_PREFIX = 'Calendar Year Return'
 
 def format_fund_size(value):
     """Format fund size value as string with comma separator."""
-    if pd.notna(value) and isinstance(value, (int, float)):
+    # numbers.Real also covers numpy ints and floats, but bools are not sizes;
+    # value == value is False only for NaN
+    if isinstance(value, numbers.Real) and not isinstance(value, bool) and value == value:
         return f"{value:,.2f}"
     return value
 
-def format_as_string(value):
-    """Convert value to string if not NaN."""
-    if pd.notna(value):
-        return str(value)
-    return value
-
 def format_dataframe_for_json(df: pd.DataFrame) -> pd.DataFrame:
     """
     Format DataFrame columns for JSON output.
@@ -208,14 +69,19 @@ def format_dataframe_for_json(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
     
-    # Format Fund size (HKD' m) as string with comma separator
-    if "Fund size (HKD' m)" in df.columns:
-        df["Fund size (HKD' m)"] = df["Fund size (HKD' m)"].apply(format_fund_size)
+    # Format Fund size (HKD' m) as string with comma separator; an all-numeric
+    # column skips the per-value type check and NaNs are never visited
+    if _FUND_SIZE_COL in df.columns:
+        sizes = df[_FUND_SIZE_COL]
+        if pd.api.types.is_numeric_dtype(sizes) and not pd.api.types.is_bool_dtype(sizes):
+            df[_FUND_SIZE_COL] = sizes.map('{:,.2f}'.format, na_action='ignore')
+        else:
+            df[_FUND_SIZE_COL] = sizes.map(format_fund_size)
     
-    # Format all Calendar Year Return columns as strings
-    for col in df.columns:
-        if col.startswith('Calendar Year Return'):
-            df[col] = df[col].apply(format_as_string)
+    # Format all Calendar Year Return columns as strings in one pass
+    cyr_cols = [col for col in df.columns if col.startswith(_CALENDAR_YEAR_PREFIX)]
+    if cyr_cols:
+        df[cyr_cols] = df[cyr_cols].map(str, na_action='ignore')
     
     return df
 
@@ -242,12 +108,15 @@ def scrape_language(language: str) -> Tuple[pd.DataFrame, str]:
 _FUND_TYPE_SEP = re.compile(r"\s+[-—]\s+")
 
 
-def _split_fund_type(value: str):
-    """Split a fund type string on the first ' - ' or ' — ' separator."""
-    m = _FUND_TYPE_SEP.search(value)
-    if m:
-        return [value[:m.start()], value[m.end():]]
-    return [value]
+@lru_cache(maxsize=None)
+def _split_fund_type(value: str) -> Tuple[str, str]:
+    """
+    Split a fund type string on the first ' - ' or ' — ' separator into stripped
+    (type, category) parts; the category is '' when there is no separator.
+    Cached, as a few dozen distinct fund types repeat across every fund.
+    """
+    parts = _FUND_TYPE_SEP.split(value, maxsplit=1)
+    return parts[0].strip(), parts[1].strip() if len(parts) > 1 else ""
 
 
 def build_fund_type_maps(table_data: Dict) -> Tuple[Dict, Dict]:
@@ -265,24 +134,19 @@ def build_fund_type_maps(table_data: Dict) -> Tuple[Dict, Dict]:
     fund_category_map: Dict[str, Dict] = {}
 
     for entry in table_data.values():
-        en_record = entry.get("english", {})
-        zh_record = entry.get("traditional_chinese", {})
-        cn_record = entry.get("simplified_chinese", {})
-
-        en_fund_type = en_record.get("Fund Type", "")
-        zh_fund_type = zh_record.get("Fund Type", "")
-        cn_fund_type = cn_record.get("Fund Type", "")
-
+        en_fund_type = entry.get("english", {}).get("Fund Type", "")
         if not en_fund_type:
             continue
 
-        en_parts = _split_fund_type(en_fund_type)
-        zh_parts = _split_fund_type(zh_fund_type) if zh_fund_type else []
-        cn_parts = _split_fund_type(cn_fund_type) if cn_fund_type else []
+        en_type, en_category = _split_fund_type(en_fund_type)
+        # Both maps already hold this English type and category: nothing new to learn
+        if en_type in fund_type_map and (not en_category or en_category in fund_category_map):
+            continue
 
-        en_type = en_parts[0].strip()
-        zh_type = zh_parts[0].strip() if zh_parts else ""
-        cn_type = cn_parts[0].strip() if cn_parts else ""
+        zh_fund_type = entry.get("traditional_chinese", {}).get("Fund Type", "")
+        cn_fund_type = entry.get("simplified_chinese", {}).get("Fund Type", "")
+        zh_type, zh_category = _split_fund_type(zh_fund_type) if zh_fund_type else ("", "")
+        cn_type, cn_category = _split_fund_type(cn_fund_type) if cn_fund_type else ("", "")
 
         if en_type and en_type not in fund_type_map:
             fund_type_map[en_type] = {
@@ -290,16 +154,11 @@ def build_fund_type_maps(table_data: Dict) -> Tuple[Dict, Dict]:
                 "simplified_chinese": cn_type,
             }
 
-        if len(en_parts) > 1:
-            en_category = en_parts[1].strip()
-            zh_category = zh_parts[1].strip() if len(zh_parts) > 1 else ""
-            cn_category = cn_parts[1].strip() if len(cn_parts) > 1 else ""
-
-            if en_category and en_category not in fund_category_map:
-                fund_category_map[en_category] = {
-                    "traditional_chinese": zh_category,
-                    "simplified_chinese": cn_category,
-                }
+        if en_category and en_category not in fund_category_map:
+            fund_category_map[en_category] = {
+                "traditional_chinese": zh_category,
+                "simplified_chinese": cn_category,
+            }
 
     return fund_type_map, fund_category_map
 
@@ -313,31 +172,50 @@ def combine_all_languages() -> Dict:
     table_data: Dict[str, Dict] = {}
     update_date = None
 
-    # Scrape all three languages
-    for lang in ['en', 'zh', 'cn']:
+    # The three pages are independent and network-bound, so fetch them concurrently
+    languages = ['en', 'zh', 'cn']
+    with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+        futures = {lang: executor.submit(scrape_language, lang) for lang in languages}
+
+    # Collect results in a fixed language order
+    frames = {}
+    for lang in languages:
         try:
-            df, date_str = scrape_language(lang)
+            df, date_str = futures[lang].result()
             lang_label = LANGUAGE_LABELS[lang]
 
             # Use the English version's update date
             if lang == 'en' and date_str:
                 update_date = f"Latest information as of {date_str}"
 
-            # Index each row by its position in the table
-            for idx, row in df.iterrows():
-                record = {k: v for k, v in row.to_dict().items() if pd.notna(v)}
-                record.pop('_language', None)
-
-                str_idx = str(idx)
-                if str_idx not in table_data:
-                    table_data[str_idx] = {}
-                table_data[str_idx][lang_label] = record
+            # Object dtype keeps ints from being upcast when the frames are aligned
+            frames[lang_label] = df.drop(columns='_language', errors='ignore').astype(object)
 
             print(f"✓ Successfully scraped {len(df)} records from {lang_label}")
         except Exception as e:
             print(f"✗ Error scraping {LANGUAGE_LABELS[lang]}: {e}", file=sys.stderr)
             # Continue with other languages even if one fails
 
+    if frames:
+        # Stack the languages into one (language, row) indexed frame and compute
+        # the NaN mask for all of it in one vectorised pass. Columns that are
+        # empty in every language never reach a record, so drop them once here
+        combined = pd.concat(frames, names=['lang', 'row']).dropna(axis=1, how='all')
+        values = combined.to_numpy(dtype=object)
+        notna = ~pd.isna(values)
+
+        # The concat orders columns by their union, so read each language's
+        # records through its own page's column order instead
+        positions = {
+            lang_label: [(combined.columns.get_loc(col), col) for col in df.columns if col in combined.columns]
+            for lang_label, df in frames.items()
+        }
+
+        # Index each row by its position in the table, with the language as sub-key
+        for (lang_label, idx), row, row_notna in zip(combined.index, values, notna):
+            record = {col: row[i] for i, col in positions[lang_label] if row_notna[i]}
+            table_data.setdefault(str(idx), {})[lang_label] = record
+
     fund_type_map, fund_category_map = build_fund_type_maps(table_data)
 
     return {
@@ -360,9 +238,10 @@ def main(output_file: str = "processed_data.json"):
     # Scrape all languages and combine
     combined_data = combine_all_languages()
     
-    # Save to JSON file
+    # Save to JSON file; encode in one shot and write once rather than letting
+    # json.dump issue a separate write for every encoded fragment
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(combined_data, f, ensure_ascii=False, indent=2)
+        f.write(json.dumps(combined_data, ensure_ascii=False, indent=2))
     
     print(f"\n✓ Successfully saved combined data to: {output_file}")
     print(f"  Total fund entries: {len(combined_data['table_data'])}")
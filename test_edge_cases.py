@@ -7,6 +7,10 @@ import numpy as np
 import json
 from mpf_scrape_json import format_dataframe_for_json
 
+def _keep(v):
+    """True unless v is None or NaN (NaN is the only value not equal to itself)."""
+    return v is not None and not (isinstance(v, float) and v != v)
+
 def test_edge_cases():
     """Test edge cases in formatting"""
     
@@ -45,7 +49,7 @@ def test_edge_cases():
     records = df_formatted.to_dict('records')
     cleaned_records = []
     for record in records:
-        cleaned_record = {k: v for k, v in record.items() if pd.notna(v)}
+        cleaned_record = {k: v for k, v in record.items() if _keep(v)}
         cleaned_records.append(cleaned_record)
     
     print(f"Original record count: {len(records)}")
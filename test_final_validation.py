@@ -4,10 +4,27 @@ Final validation test matching exactly the issue requirements
 """
 import pandas as pd
 import numpy as np
-import json
+from pandas.io.json import ujson_dumps
 from unittest.mock import patch
 from mpf_scrape_json import format_dataframe_for_json, combine_all_languages, build_fund_type_maps, LANGUAGE_LABELS
 
+# Language sub-keys every table_data entry must carry
+_EXPECTED_LANGS = frozenset(LANGUAGE_LABELS.values())
+
+# Two-fund frame the combine tests stamp with a scheme name and language per
+# mocked scrape; assign() returns a new frame, so the template is never mutated
+_TEMPLATE = pd.DataFrame({
+    'Scheme': ['', ''],
+    'Constituent Fund': ['Fund A', 'Fund B'],
+    'MPF Trustee': ['Trustee X', 'Trustee X'],
+    'Fund Type': ['Equity', 'Bond'],
+    'Launch Date': ['01-01-2020', '01-01-2021'],
+    "Fund size (HKD' m)": ['100.00', '200.00'],
+    'Risk Class': ['5', '3'],
+    'Latest FER (%)': ['1.00', '0.50'],
+    '_language': ['', ''],
+})
+
 def test_exact_issue_requirements():
     """
     Test that exactly matches the before/after example in the issue
@@ -38,24 +55,28 @@ def test_exact_issue_requirements():
     print("\n📋 BEFORE FORMATTING (Current/Now state):")
     print("-" * 70)
     df = pd.DataFrame(test_data)
-    record_before = df.to_dict('records')[0]
-    print(json.dumps(record_before, indent=2, ensure_ascii=False, default=str))
+    record_before = dict(zip(df.columns, next(df.itertuples(index=False, name=None))))
+    print(ujson_dumps(record_before, indent=2, ensure_ascii=False))
     
     # Apply formatting
     df_formatted = format_dataframe_for_json(df)
     
-    # Convert to dict and remove NaN values
-    records = df_formatted.to_dict('records')
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {k: v for k, v in record.items() if pd.notna(v)}
-        cleaned_records.append(cleaned_record)
+    # Convert to dict and remove NaN values: all-NaN columns are dropped first,
+    # then the mask is computed once for what remains
+    df_formatted = df_formatted.dropna(axis=1, how='all')
+    columns = df_formatted.columns.tolist()
+    values = df_formatted.to_numpy(dtype=object)
+    mask = df_formatted.notna().to_numpy()
+    cleaned_records = [
+        {k: v for k, v, keep in zip(columns, row, row_mask) if keep}
+        for row, row_mask in zip(values, mask)
+    ]
     
     actual_output = cleaned_records[0]
     
     print("\n✅ AFTER FORMATTING (Expected/Updated state):")
     print("-" * 70)
-    print(json.dumps(actual_output, indent=2, ensure_ascii=False))
+    print(ujson_dumps(actual_output, indent=2, ensure_ascii=False))
     
     # Define expected output from the issue
     expected_output = {
@@ -93,31 +114,20 @@ def test_exact_issue_requirements():
         "Details field should be removed when NaN"
     print("✓ Details field (NaN) successfully removed from output")
     
-    # 3. Check Calendar Year Return fields
-    calendar_years = ['2024', '2023', '2022', '2021', '2020']
-    for year in calendar_years:
-        key = f'Calendar Year Return (%)\n-  {year}'
-        assert key in actual_output, f"Missing Calendar Year Return for {year}"
-        assert isinstance(actual_output[key], str), \
-            f"Calendar Year Return {year} must be string, got {type(actual_output[key])}"
+    # 3. Check every Calendar Year Return value is a string. This is checked on
+    #    the values themselves: the dtype pandas infers for a frame of strings
+    #    is object on pandas 2 but str on pandas >= 3
+    cyr_values = [v for k, v in actual_output.items() if k.startswith('Calendar Year Return')]
+    assert len(cyr_values) == 5, f"Expected 5 Calendar Year Return fields, got {len(cyr_values)}"
+    assert all(isinstance(v, str) for v in cyr_values), \
+        f"Calendar Year Return values must be strings, got {[type(v).__name__ for v in cyr_values]}"
     print("✓ All Calendar Year Return fields present and formatted as strings")
     
-    # 4. Verify specific values
-    assert actual_output['Calendar Year Return (%)\n-  2024'] == '3.09'
-    assert actual_output['Calendar Year Return (%)\n-  2023'] == '7.1'
-    assert actual_output['Calendar Year Return (%)\n-  2022'] == '-14.78'
-    assert actual_output['Calendar Year Return (%)\n-  2021'] == '0.89'
-    assert actual_output['Calendar Year Return (%)\n-  2020'] == '8.12'
+    # 4. Compare the whole record with the issue's expected output in one go:
+    #    matching columns and values means every required field is present
+    #    with the expected text
+    pd.testing.assert_frame_equal(pd.DataFrame([actual_output]), pd.DataFrame([expected_output]))
     print("✓ All Calendar Year Return values match expected format")
-    
-    # 5. Check all required fields are present
-    required_fields = [
-        'Scheme', 'Constituent Fund', 'MPF Trustee', 'Fund Type', 
-        'Launch Date', "Fund size (HKD' m)", 'Risk Class', 'Latest FER (%)', 
-        '_language'
-    ]
-    for field in required_fields:
-        assert field in actual_output, f"Missing required field: {field}"
     print("✓ All required fields present in output")
     
     print("\n" + "=" * 70)
@@ -140,26 +150,17 @@ def test_indexed_table_data_structure():
 
     # Build two minimal DataFrames (one per language) to avoid real HTTP calls
     def make_df(scheme_name, lang_label):
-        df = pd.DataFrame({
-            'Scheme': [scheme_name, scheme_name + ' B'],
-            'Constituent Fund': ['Fund A', 'Fund B'],
-            'MPF Trustee': ['Trustee X', 'Trustee X'],
-            'Fund Type': ['Equity', 'Bond'],
-            'Launch Date': ['01-01-2020', '01-01-2021'],
-            "Fund size (HKD' m)": ['100.00', '200.00'],
-            'Risk Class': ['5', '3'],
-            'Latest FER (%)': ['1.00', '0.50'],
-            '_language': [lang_label, lang_label],
-        })
+        df = _TEMPLATE.assign(Scheme=[scheme_name, scheme_name + ' B'], _language=lang_label)
         return df, None  # (dataframe, date_str)
 
-    side_effects = [
-        make_df('Scheme EN', 'english'),
-        make_df('Scheme ZH', 'traditional_chinese'),
-        make_df('Scheme CN', 'simplified_chinese'),
-    ]
+    # Keyed by language code: the languages are scraped concurrently
+    side_effects = {
+        'en': make_df('Scheme EN', 'english'),
+        'zh': make_df('Scheme ZH', 'traditional_chinese'),
+        'cn': make_df('Scheme CN', 'simplified_chinese'),
+    }
 
-    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects):
+    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects.get):
         result = combine_all_languages()
 
     table_data = result['table_data']
@@ -170,22 +171,21 @@ def test_indexed_table_data_structure():
     print("✓ table_data is a dict")
 
     # Keys must be string row indices
-    assert set(table_data.keys()) == {'0', '1'}, \
+    assert table_data.keys() == {'0', '1'}, \
         f"Expected keys {{'0','1'}}, got {set(table_data.keys())}"
     print("✓ Keys are string row indices '0' and '1'")
 
     # Each entry must have all three language sub-keys
     for row_key in ['0', '1']:
         entry = table_data[row_key]
-        assert set(entry.keys()) == {'english', 'traditional_chinese', 'simplified_chinese'}, \
+        assert entry.keys() == _EXPECTED_LANGS, \
             f"Entry {row_key} missing language keys: {set(entry.keys())}"
     print("✓ Each entry contains all three language sub-keys")
 
     # _language field must NOT appear in the fund records
-    for row_key, entry in table_data.items():
-        for lang, record in entry.items():
-            assert '_language' not in record, \
-                f"_language should be removed from record at index {row_key}/{lang}"
+    all_keys = set().union(*(record.keys() for entry in table_data.values() for record in entry.values()))
+    assert '_language' not in all_keys, \
+        "_language should be removed from every fund record"
     print("✓ _language field removed from all fund records")
 
     # Spot-check a value
@@ -326,26 +326,16 @@ def test_combine_all_languages_includes_fund_maps():
     print("=" * 70)
 
     def make_df(scheme_name, lang_label, fund_type):
-        df = pd.DataFrame({
-            'Scheme': [scheme_name],
-            'Constituent Fund': ['Fund A'],
-            'MPF Trustee': ['Trustee X'],
-            'Fund Type': [fund_type],
-            'Launch Date': ['01-01-2020'],
-            "Fund size (HKD' m)": ['100.00'],
-            'Risk Class': ['5'],
-            'Latest FER (%)': ['1.00'],
-            '_language': [lang_label],
-        })
+        df = _TEMPLATE.iloc[:1].assign(Scheme=scheme_name, _language=lang_label, **{'Fund Type': fund_type})
         return df, None
 
-    side_effects = [
-        make_df('Scheme EN', 'english', 'Equity Fund - China Equity Fund'),
-        make_df('Scheme ZH', 'traditional_chinese', '股票基金 - 中國股票基金'),
-        make_df('Scheme CN', 'simplified_chinese', '股票基金 - 中国股票基金'),
-    ]
+    side_effects = {
+        'en': make_df('Scheme EN', 'english', 'Equity Fund - China Equity Fund'),
+        'zh': make_df('Scheme ZH', 'traditional_chinese', '股票基金 - 中國股票基金'),
+        'cn': make_df('Scheme CN', 'simplified_chinese', '股票基金 - 中国股票基金'),
+    }
 
-    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects):
+    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects.get):
         result = combine_all_languages()
 
     assert 'fund_type_map' in result, "fund_type_map must be present in output"
@@ -360,8 +350,63 @@ def test_combine_all_languages_includes_fund_maps():
     print("=" * 70)
 
 
+def test_record_key_order():
+    """
+    Test that every record keeps the page's column order, even when a column
+    is filled in only one language or missing from the English page.
+    """
+    print("\n" + "=" * 70)
+    print("TEST - Record key order across languages")
+    print("=" * 70)
+
+    # Details sits before Risk Class on the page but only zh fills it in
+    def make_df(lang_label, details):
+        df = _TEMPLATE.assign(_language=lang_label, Details=details)
+        return df[[*_TEMPLATE.columns[:6], 'Details', *_TEMPLATE.columns[6:]]], None
+
+    side_effects = {
+        'en': make_df('english', [np.nan, np.nan]),
+        'zh': make_df('traditional_chinese', ['詳情', np.nan]),
+        'cn': make_df('simplified_chinese', [np.nan, np.nan]),
+    }
+
+    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects.get):
+        result = combine_all_languages()
+
+    page_order = [col for col in side_effects['zh'][0].columns if col != '_language']
+    zh_keys = list(result['table_data']['0']['traditional_chinese'])
+    assert zh_keys == page_order, f"Expected keys in page order {page_order}, got {zh_keys}"
+    en_keys = list(result['table_data']['0']['english'])
+    assert en_keys == [col for col in page_order if col != 'Details'], f"Unexpected english keys {en_keys}"
+    print("✓ Records keep the page's column order")
+
+    # Fund Type sits between Constituent Fund and MPF Trustee on the zh/cn
+    # pages but is missing from the English page altogether
+    en_df = _TEMPLATE.drop(columns='Fund Type').assign(_language='english')
+    side_effects = {
+        'en': (en_df, None),
+        'zh': (_TEMPLATE.assign(_language='traditional_chinese'), None),
+        'cn': (_TEMPLATE.assign(_language='simplified_chinese'), None),
+    }
+
+    with patch('mpf_scrape_json.scrape_language', side_effect=side_effects.get):
+        result = combine_all_languages()
+
+    page_order = [col for col in _TEMPLATE.columns if col != '_language']
+    for lang_label in ('traditional_chinese', 'simplified_chinese'):
+        keys = list(result['table_data']['0'][lang_label])
+        assert keys == page_order, f"Expected {lang_label} keys in page order {page_order}, got {keys}"
+    en_keys = list(result['table_data']['0']['english'])
+    assert en_keys == [col for col in page_order if col != 'Fund Type'], f"Unexpected english keys {en_keys}"
+    print("✓ A column missing from the English page keeps its place in zh/cn records")
+
+    print("\n✅ ALL KEY ORDER TESTS PASSED!")
+    print("=" * 70)
+
+
 if __name__ == "__main__":
     test_exact_issue_requirements()
     test_indexed_table_data_structure()
     test_build_fund_type_maps()
     test_combine_all_languages_includes_fund_maps()
+    test_record_key_order()
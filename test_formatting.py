@@ -2,63 +2,90 @@
 """
 Test script to validate data formatting changes for processed_data.json
 """
+import argparse
+import logging
 import pandas as pd
 import numpy as np
-import json
-from mpf_scrape_json import format_dataframe_for_json
+from pandas.io.json import ujson_dumps
+from mpf_scrape_json import format_dataframe_for_json, format_fund_size
+
+log = logging.getLogger(__name__)
+
+def _format_records(records):
+    """
+    Format and clean plain row dicts in one pass, without a DataFrame, to
+    cross-check format_dataframe_for_json; missing scalars are left out.
+    """
+    for record in records:
+        formatted = {}
+        for key, value in record.items():
+            if pd.api.types.is_scalar(value) and pd.isna(value):
+                continue
+            if key == "Fund size (HKD' m)":
+                value = format_fund_size(value)
+            elif key.startswith('Calendar Year Return'):
+                value = str(value)
+            formatted[key] = value
+        yield formatted
+
+# (label, column) pairs whose first-row cell is logged before and after formatting
+_SAMPLE_COLUMNS = (
+    ("Fund size", "Fund size (HKD' m)"),
+    ("Calendar Year 2024", 'Calendar Year Return (%)\n-  2024'),
+)
+
+def _log_frame(title: str, df: pd.DataFrame):
+    """Log the dtypes and each sample cell's type and value at DEBUG level."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    log.debug("%s\n%s\n\nSample values:", title, df.dtypes)
+    for label, col in _SAMPLE_COLUMNS:
+        value = df.iat[0, df.columns.get_loc(col)]
+        log.debug("%s type: %s", label, type(value))
+        log.debug("%s value: %s", label, value)
 
 def test_formatting():
     """Test that the formatting function works correctly"""
     
-    # Create a mock DataFrame with the structure similar to what we'd get from scraping
+    # Create mock columns with the structure similar to what we'd get from scraping.
+    # The numeric columns are float64 arrays, so their dtypes are declared up front
     test_data = {
-        'Scheme': ['AIA MPF - Prime Value Choice'],
-        'Constituent Fund': ['Age 65 Plus Fund'],
-        'MPF Trustee': ['AIAT'],
-        'Fund Type': ['Mixed Assets Fund - Default Investment Strategy - Age 65 Plus Fund'],
-        'Launch Date': ['01-04-2017'],
-        "Fund size (HKD' m)": [2496.08],  # Numeric value
-        'Risk Class': ['4'],
-        'Latest FER (%)': ['0.78633'],
-        'Calendar Year Return (%)\n-  2024': [3.09],  # Numeric value
-        'Calendar Year Return (%)\n-  2023': [7.10],  # Numeric value
-        'Calendar Year Return (%)\n-  2022': [-14.78],  # Numeric value
-        'Calendar Year Return (%)\n-  2021': [0.89],  # Numeric value
-        'Calendar Year Return (%)\n-  2020': [8.12],  # Numeric value
-        'Details': [np.nan],  # NaN value
-        '_language': ['english']
+        'Scheme': np.array(['AIA MPF - Prime Value Choice'], dtype=object),
+        'Constituent Fund': np.array(['Age 65 Plus Fund'], dtype=object),
+        'MPF Trustee': np.array(['AIAT'], dtype=object),
+        'Fund Type': np.array(['Mixed Assets Fund - Default Investment Strategy - Age 65 Plus Fund'], dtype=object),
+        'Launch Date': np.array(['01-04-2017'], dtype=object),
+        "Fund size (HKD' m)": np.array([2496.08], dtype=np.float64),  # Numeric value
+        'Risk Class': np.array(['4'], dtype=object),
+        'Latest FER (%)': np.array(['0.78633'], dtype=object),
+        'Calendar Year Return (%)\n-  2024': np.array([3.09], dtype=np.float64),  # Numeric value
+        'Calendar Year Return (%)\n-  2023': np.array([7.10], dtype=np.float64),  # Numeric value
+        'Calendar Year Return (%)\n-  2022': np.array([-14.78], dtype=np.float64),  # Numeric value
+        'Calendar Year Return (%)\n-  2021': np.array([0.89], dtype=np.float64),  # Numeric value
+        'Calendar Year Return (%)\n-  2020': np.array([8.12], dtype=np.float64),  # Numeric value
+        'Details': np.array([np.nan], dtype=np.float64),  # NaN value
+        '_language': np.array(['english'], dtype=object),
     }
     
     df = pd.DataFrame(test_data)
     
-    print("Before formatting:")
-    print(df.dtypes)
-    print("\nSample values:")
-    print(f"Fund size type: {type(df['Fund size (HKD\' m)'].iloc[0])}")
-    print(f"Fund size value: {df['Fund size (HKD\' m)'].iloc[0]}")
-    print(f"Calendar Year 2024 type: {type(df['Calendar Year Return (%)\n-  2024'].iloc[0])}")
-    print(f"Calendar Year 2024 value: {df['Calendar Year Return (%)\n-  2024'].iloc[0]}")
+    _log_frame("Before formatting:", df)
     
     # Apply formatting
     df_formatted = format_dataframe_for_json(df)
     
-    print("\n\nAfter formatting:")
-    print(df_formatted.dtypes)
-    print("\nSample values:")
-    print(f"Fund size type: {type(df_formatted['Fund size (HKD\' m)'].iloc[0])}")
-    print(f"Fund size value: {df_formatted['Fund size (HKD\' m)'].iloc[0]}")
-    print(f"Calendar Year 2024 type: {type(df_formatted['Calendar Year Return (%)\n-  2024'].iloc[0])}")
-    print(f"Calendar Year 2024 value: {df_formatted['Calendar Year Return (%)\n-  2024'].iloc[0]}")
-    
-    # Convert to dict and remove NaN values
-    records = df_formatted.to_dict('records')
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {k: v for k, v in record.items() if pd.notna(v)}
-        cleaned_records.append(cleaned_record)
+    _log_frame("\n\nAfter formatting:", df_formatted)
     
-    print("\n\nFinal JSON record:")
-    print(json.dumps(cleaned_records[0], indent=2, ensure_ascii=False))
+    # Convert to dict and remove NaN values, filling the records column by
+    # column: each column's values and NaN mask are taken as arrays once
+    cleaned_records = [{} for _ in range(len(df_formatted))]
+    for col in df_formatted.columns:
+        values = df_formatted[col].to_numpy(dtype=object)
+        for i in np.flatnonzero(df_formatted[col].notna().to_numpy()):
+            cleaned_records[i][col] = values[i]
+    
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("\n\nFinal JSON record:\n%s", ujson_dumps(cleaned_records[0], indent=2, ensure_ascii=False))
     
     # Validate expected output
     expected_record = {
@@ -80,32 +107,72 @@ def test_formatting():
     
     actual_record = cleaned_records[0]
     
-    print("\n\nValidation:")
-    print("=" * 60)
-    
-    # Check Fund size formatting
-    fund_size_value = actual_record["Fund size (HKD' m)"]
-    assert fund_size_value == "2,496.08", \
-        f"Fund size not formatted correctly: got {fund_size_value} expected 2,496.08"
-    print("✓ Fund size formatted correctly as string with comma: '2,496.08'")
-    
-    # Check that Details field is removed (was NaN)
-    assert 'Details' not in actual_record, "Details field should be removed (was NaN)"
-    print("✓ Details field (NaN) removed from output")
-    
-    # Check Calendar Year Return fields are strings
-    for year in ['2024', '2023', '2022', '2021', '2020']:
-        key = f'Calendar Year Return (%)\n-  {year}'
-        assert key in actual_record, f"Missing Calendar Year Return for {year}"
-        assert isinstance(actual_record[key], str), \
-            f"Calendar Year Return {year} should be string, got {type(actual_record[key])}"
-    print("✓ All Calendar Year Return fields present and formatted as strings")
-    
-    print("\n✓ All validations passed!")
-    print("\nExpected format matches the issue requirements:")
-    print("- Fund size is a string with comma separator")
-    print("- NaN values (Details) are removed")
-    print("- Calendar Year Return fields are present and formatted as strings")
+    log.info("\n\nValidation:\n%s", "=" * 60)
+    
+    # Compare the whole record at once, reporting every differing key on failure
+    assert actual_record == expected_record, (
+        f"diff: added={sorted(actual_record.keys() - expected_record.keys())} "
+        f"removed={sorted(expected_record.keys() - actual_record.keys())} "
+        f"changed={ {k: (actual_record[k], v) for k, v in expected_record.items() if k in actual_record and actual_record[k] != v} }"
+    )
+    log.info("✓ Fund size formatted correctly as string with comma: '2,496.08'")
+    log.info("✓ Details field (NaN) removed from output")
+    log.info("✓ All Calendar Year Return fields present and formatted as strings")
+    
+    # A single pass straight over the row dicts must give the same records
+    rows = [dict(zip(test_data, row)) for row in zip(*test_data.values())]
+    fused_records = list(_format_records(rows))
+    assert fused_records == cleaned_records, f"Row-dict formatting gave {fused_records}"
+    log.info("✓ Row-dict formatting matches format_dataframe_for_json")
+    
+    log.info("\n✓ All validations passed!")
+    log.info("\nExpected format matches the issue requirements:\n"
+             "- Fund size is a string with comma separator\n"
+             "- NaN values (Details) are removed\n"
+             "- Calendar Year Return fields are present and formatted as strings")
+
+def test_format_records_edge_values():
+    """Row-dict formatting treats numpy ints, bools and pd.NA like format_dataframe_for_json"""
+    fund_size = "Fund size (HKD' m)"
+    cyr_2024 = 'Calendar Year Return (%)\n-  2024'
+    rows = [
+        {'Scheme': 'A', fund_size: np.int64(1234), cyr_2024: np.float64(3.1)},
+        {'Scheme': 'B', fund_size: pd.NA, cyr_2024: None},
+        {'Scheme': 'C', fund_size: '789.01', cyr_2024: np.nan},
+        {'Scheme': pd.NA, fund_size: 0.5, cyr_2024: -2.5},
+        {'Scheme': 'D', fund_size: True, cyr_2024: np.nan},
+    ]
+    expected = [
+        {'Scheme': 'A', fund_size: '1,234.00', cyr_2024: '3.1'},
+        {'Scheme': 'B'},
+        {'Scheme': 'C', fund_size: '789.01'},
+        {fund_size: '0.50', cyr_2024: '-2.5'},
+        {'Scheme': 'D', fund_size: True},
+    ]
+    
+    fused = list(_format_records(rows))
+    assert fused == expected, f"Row-dict formatting gave {fused}"
+    
+    df_formatted = format_dataframe_for_json(pd.DataFrame(rows))
+    from_frame = [
+        {k: v for k, v in record.items() if not pd.isna(v)}
+        for record in df_formatted.to_dict('records')
+    ]
+    assert from_frame == expected, f"format_dataframe_for_json gave {from_frame}"
+    
+    # Bools are not fund sizes, even in an all-bool column
+    bools = format_dataframe_for_json(pd.DataFrame({fund_size: [True, False]}))[fund_size].tolist()
+    assert bools == [True, False], f"Bool fund sizes should be left alone, got {bools}"
+    
+    # List-like values are kept rather than tested for NaN
+    listed = list(_format_records([{'Scheme': ['A', 'B'], fund_size: np.nan}]))
+    assert listed == [{'Scheme': ['A', 'B']}], f"Row-dict formatting gave {listed}"
+    log.info("✓ numpy ints, bools and pd.NA handled alike by both formatters")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Validate format_dataframe_for_json on a sample fund row')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Also log dtypes, sample values and the final JSON record')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(message)s')
     test_formatting()
+    test_format_records_edge_values()
@@ -1,32 +1,35 @@
-import requests
-import pandas as pd
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+
+from mpf_common import fetch_html, main_table_header
 
 def test_url(url, lang):
     print(f"\n{'='*60}")
     print(f"Testing {lang} - {url}")
     print('='*60)
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    
-    resp = requests.get(url, headers=headers, timeout=30)
-    resp.encoding = resp.apparent_encoding or "utf-8"
-    html = resp.text
-    
-    tables = pd.read_html(StringIO(html), flavor="lxml")
-    print(f"Found {len(tables)} tables")
+    # Shared fetcher: repeated runs within a day read the page from .cache/
+    # and later ones revalidate it instead of downloading it again
+    html = fetch_html(url)
     
-    if tables:
-        df = max(tables, key=lambda t: len(t))
-        print(f"\nMain table shape: {df.shape}")
-        print(f"\nColumn structure (all columns):")
-        for i, col in enumerate(df.columns):
-            level_0, level_1, level_2 = col
-            print(f"{i}: L0={level_0} | L1={level_1} | L2={level_2}")
+    # Only the header rows are expanded; no DataFrame is built for the body
+    columns, n_rows = main_table_header(html)
+    print(f"\nMain table shape: {(n_rows, len(columns))}")
+    print(f"\nColumn structure (all columns):")
+    for i, col in enumerate(columns):
+        level_0, level_1, level_2 = col
+        print(f"{i}: L0={level_0} | L1={level_1} | L2={level_2}")
 
 # Test all three languages
-test_url("https://mfp.mpfa.org.hk/eng/mpp_list.jsp", "English")
-test_url("https://mfp.mpfa.org.hk/tch/mpp_list.jsp", "Traditional Chinese")
-test_url("https://mfp.mpfa.org.hk/sch/mpp_list.jsp", "Simplified Chinese")
+pages = [
+    ("https://mfp.mpfa.org.hk/eng/mpp_list.jsp", "English"),
+    ("https://mfp.mpfa.org.hk/tch/mpp_list.jsp", "Traditional Chinese"),
+    ("https://mfp.mpfa.org.hk/sch/mpp_list.jsp", "Simplified Chinese"),
+]
+
+# The downloads are independent, so overlap them on a thread pool first;
+# fetch_html memoizes each page, so the reports below reuse the results
+with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+    list(executor.map(fetch_html, [url for url, _ in pages]))
+
+for url, lang in pages:
+    test_url(url, lang)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared table parser in mpf_common, run through both scrapers'
+parse_main_table on a small fixture page
+"""
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import requests
+
+import mpf_common
+import mpf_scrape
+import mpf_scrape_json
+from mpf_common import extract_update_date, fetch_html, load_dfs, main_table_header
+
+# A cut-down copy of the MPFA fund list: a navigation table, a hidden table
+# with more rows, and the main table with a 3-row rowspan/colspan header,
+# <br> and hidden (display:none) cells, repeated '1 Year' / '5 Year' headers,
+# N/A and blank cells, and a trailing all-blank spacer row
+_FIXTURE_HTML = """<html><head><meta charset="utf-8"></head><body>
+<div>Latest information as of : 31 Oct 2025</div>
+<table><tr><td>Home</td><td>Search</td></tr></table>
+<table style="display: none">
+<tr><td>hidden</td></tr><tr><td>hidden</td></tr><tr><td>hidden</td></tr>
+<tr><td>hidden</td></tr><tr><td>hidden</td></tr><tr><td>hidden</td></tr>
+</table>
+<table>
+<thead>
+<tr>
+<th rowspan="3">Scheme</th><th rowspan="3">Constituent<br>Fund</th><th rowspan="3">MPF<br>Trustee</th>
+<th rowspan="3">Fund Type</th><th rowspan="3">Launch Date</th><th rowspan="3">Fund size (HKD' m)</th>
+<th rowspan="3" style="display:none">Internal ID</th>
+<th rowspan="3">Risk Class</th><th rowspan="3">Latest FER (%)</th>
+<th colspan="5">Fund Performance</th>
+<th rowspan="2">Calendar Year Return (%) - 2024</th><th rowspan="2">Calendar Year Return (%) - 2023</th>
+<th rowspan="3">Details</th><th rowspan="3"></th>
+</tr>
+<tr><th colspan="5">Return</th></tr>
+<tr><th>1 Year</th><th>5 Year</th><th>1 Year</th><th>5 Year</th><th>1 Year</th><th>2024</th><th>2023</th></tr>
+</thead>
+<tbody>
+<tr><td>AIA MPF - Prime Value Choice</td><td>Age 65 Plus Fund</td><td>AIAT</td>
+<td>Mixed Assets Fund - Default Investment Strategy - Age 65 Plus Fund</td><td>01-04-2017</td><td>2,496.08</td>
+<td style="display:none">X1</td><td>4</td><td>0.78633</td>
+<td>3.09</td><td>12.50</td><td>3.09</td><td>N/A</td><td>1.5</td><td>3.10</td><td>7.1</td><td><a href="#">Details</a></td><td></td></tr>
+<tr><td>BCT Strategic MPF Scheme</td><td>BCT China Fund</td><td>BCTT</td>
+<td>Equity Fund - China Equity Fund</td><td>01-12-2000</td><td>12</td>
+<td style="display:none">X2</td><td>6</td><td>N/A</td>
+<td>-14.78</td><td></td><td>-14.78</td><td>-20.00</td><td>-2.5</td><td>-14.78</td><td>0.89</td><td></td><td></td></tr>
+<tr><td></td><td></td><td></td><td></td><td></td><td></td><td style="display:none"></td><td></td><td></td>
+<td></td><td></td><td></td><td></td><td></td><td></td><td></td><td></td><td></td></tr>
+</tbody>
+</table>
+</body></html>"""
+
+# Basic-info values shared by both scrapers' output
+_BASIC_VALUES = {
+    'Scheme': ['AIA MPF - Prime Value Choice', 'BCT Strategic MPF Scheme'],
+    'Constituent Fund': ['Age 65 Plus Fund', 'BCT China Fund'],
+    'MPF Trustee': ['AIAT', 'BCTT'],
+    'Fund Type': ['Mixed Assets Fund - Default Investment Strategy - Age 65 Plus Fund', 'Equity Fund - China Equity Fund'],
+    'Launch Date': ['01-04-2017', '01-12-2000'],
+}
+
+def test_main_table_header():
+    """The header tuples match pd.read_html's, and hidden tables are ignored"""
+    columns, n_rows = main_table_header(_FIXTURE_HTML)
+    expected = max(pd.read_html(StringIO(_FIXTURE_HTML)), key=len)
+    
+    assert columns == list(expected.columns), f"Header columns differ from pd.read_html: {columns}"
+    assert n_rows == len(expected) == 3, f"Expected 3 body rows, got {n_rows}"
+    assert ('Constituent Fund', 'Constituent Fund', 'Constituent Fund') in columns, "<br> should separate header words"
+    assert ('Fund Performance', 'Return', '1 Year.2') in columns, "Repeated headers should get .1/.2 suffixes"
+    assert not any('Internal ID' in level for col in columns for level in col), "Hidden header cell should be dropped"
+    print("✓ Header columns match pd.read_html")
+
+def test_parse_main_table_csv():
+    """mpf_scrape keeps the return periods, with numeric columns as floats"""
+    df = mpf_scrape.parse_main_table(_FIXTURE_HTML)
+    expected = pd.DataFrame({
+        **_BASIC_VALUES,
+        "Fund Size (HKD'm)": [2496.08, 12.0],
+        'Risk Class': [4.0, 6.0],
+        'FER (%)': [0.78633, np.nan],
+        'Annualized Return (% p.a.) - 1 Year': [3.09, -14.78],
+        'Annualized Return (% p.a.) - 5 Year': [12.5, np.nan],
+        'Cumulative Return (%) - 1 Year': [3.09, -14.78],
+        'Cumulative Return (%) - 5 Year': [np.nan, -20.0],
+        'Calendar Year Return (%) - 2024': [1.5, -2.5],
+        'Details': ['Details', np.nan],
+    })
+    
+    pd.testing.assert_frame_equal(df, expected)
+    print("✓ mpf_scrape.parse_main_table columns, dtypes and values")
+
+def test_parse_main_table_json():
+    """mpf_scrape_json keeps the calendar years, with numeric columns as floats"""
+    df = mpf_scrape_json.parse_main_table(_FIXTURE_HTML)
+    expected = pd.DataFrame({
+        **_BASIC_VALUES,
+        "Fund size (HKD' m)": [2496.08, 12.0],
+        'Risk Class': [4.0, 6.0],
+        'Latest FER (%)': [0.78633, np.nan],
+        'Calendar Year Return (%)\n-  2024': [3.1, -14.78],
+        'Calendar Year Return (%)\n-  2023': [7.1, 0.89],
+        'Details': ['Details', np.nan],
+    })
+    
+    pd.testing.assert_frame_equal(df, expected)
+    
+    # The numeric dtypes are what give the JSON its '12.00' / '3.1' formatting
+    record = mpf_scrape_json.format_dataframe_for_json(df).iloc[1].to_dict()
+    fund_size = record["Fund size (HKD' m)"]
+    assert fund_size == '12.00', f"Fund size formatted as {fund_size!r}"
+    assert record['Calendar Year Return (%)\n-  2024'] == '-14.78'
+    print("✓ mpf_scrape_json.parse_main_table columns, dtypes and values")
+
+# Update-date banners as they appear on the en/zh/cn pages, with and without
+# a colon (ASCII or full-width), &nbsp; / &#160; padding, and other text
+# between the phrase and the date
+_DATE_BANNERS = (
+    ('<td>Latest information as of : 31 Oct 2025</td>', '31 Oct 2025'),
+    ('<td>Latest information as of&nbsp;:&nbsp;1 Nov 2025</td>', '1 Nov 2025'),
+    ('<td>Latest information as of 30 September 2025</td>', '30 September 2025'),
+    ('<td>latest information AS OF: 31 Oct 2025</td>', '31 Oct 2025'),
+    ('<td>最新資料截至 2025年10月31日</td>', '2025年10月31日'),
+    ('<td>最新資料截至：2025年10月31日</td>', '2025年10月31日'),
+    ('<td>最新資料截至&nbsp;:&nbsp;2025年1月5日</td>', '2025年1月5日'),
+    ('<td>最新资料截至 2025年10月31日</td>', '2025年10月31日'),
+    ('<td>最新资料截至：&nbsp;2025年10月31日</td>', '2025年10月31日'),
+    ('<td>Latest information as of&#160;:&#160;31&#160;Oct&#160;2025</td>', '31 Oct 2025'),
+    ('<td>Latest information as of&nbsp;31&nbsp;Oct&nbsp;2025</td>', '31 Oct 2025'),
+    ('<td>最新資料截至&#160;2025年10月31日</td>', '2025年10月31日'),
+    ('<td>Latest information as of (HK time) : 31 Oct 2025</td>', '31 Oct 2025'),
+    ('<td>Latest information as of - 31 Oct 2025</td>', '31 Oct 2025'),
+    ('<td>最新資料截至（香港時間）2025年10月31日</td>', '2025年10月31日'),
+    ('<td>最新资料截至&#160;-&#160;2025年10月31日</td>', '2025年10月31日'),
+)
+
+def test_extract_update_date():
+    """The banner date is found in every language, and None is returned without one"""
+    for html, expected in _DATE_BANNERS:
+        actual = extract_update_date(f"<html><body><table><tr>{html}</tr></table></body></html>")
+        assert actual == expected, f"{html!r}: expected {expected!r}, got {actual!r}"
+    
+    assert extract_update_date(_FIXTURE_HTML) == '31 Oct 2025'
+    assert extract_update_date("<html><body>No date here, 31 Oct 2025</body></html>") is None
+    assert extract_update_date("<td>Latest information as of : soon</td>") is None
+    # The fallback does not look past markup for the date
+    assert extract_update_date("<td>Latest information as of</td><td>31 Oct 2025</td>") is None
+    print("✓ Update dates extracted for en/zh/cn banners")
+
+def _response(status: int, content: bytes = b"", headers: dict = None) -> requests.Response:
+    """Build a requests.Response as the session would return it."""
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = content
+    resp.headers.update(headers or {})
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
+
+def _expire(path: Path):
+    """Age a cache file past CACHE_MAX_AGE."""
+    old = time.time() - mpf_common.CACHE_MAX_AGE - 60
+    os.utime(path, (old, old))
+
+def test_fetch_html_cache():
+    """Downloads are cached with their validators, then revalidated once stale"""
+    url = "https://example.invalid/tch/mpp_list.jsp"
+    page = "<html><body>最新資料截至 2025年10月31日</body></html>"
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(mpf_common, "CACHE_DIR", Path(tmp)), \
+            mock.patch.object(mpf_common._SESSION, "get") as get:
+        cache_file = mpf_common._cache_path(url, ".html")
+        meta_file = mpf_common._cache_path(url, ".json")
+        
+        # First fetch: the declared charset is used and the validators are saved
+        get.return_value = _response(200, page.encode("big5"), {
+            "Content-Type": "text/html; charset=big5",
+            "ETag": '"v1"',
+            "Last-Modified": "Fri, 31 Oct 2025 00:00:00 GMT",
+        })
+        fetch_html.cache_clear()
+        assert fetch_html(url) == page
+        assert get.call_args.kwargs["headers"] == {}
+        assert cache_file.read_text(encoding="utf-8") == page
+        assert json.loads(meta_file.read_text(encoding="utf-8")) == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Fri, 31 Oct 2025 00:00:00 GMT",
+        }
+        
+        # Fresh cache: no request at all
+        get.reset_mock()
+        fetch_html.cache_clear()
+        assert fetch_html(url) == page
+        assert not get.called, "A fresh cache file should be used without a request"
+        
+        # Stale cache: a conditional GET, and a 304 reuses the file and restarts its max-age
+        _expire(cache_file)
+        get.return_value = _response(304)
+        fetch_html.cache_clear()
+        assert fetch_html(url) == page
+        assert get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Fri, 31 Oct 2025 00:00:00 GMT",
+        }
+        assert mpf_common._is_fresh(cache_file), "A 304 should touch the cached page"
+        
+        # A 304 whose cached copy has gone missing falls back to a full GET
+        _expire(cache_file)
+        updated = page.replace("31日", "30日")
+        
+        def revalidate(url, timeout, headers):
+            if headers:
+                cache_file.unlink()
+                return _response(304)
+            return _response(200, updated.encode("utf-8"), {"Content-Type": "text/html; charset=utf-8"})
+        
+        get.side_effect = revalidate
+        fetch_html.cache_clear()
+        assert fetch_html(url) == updated
+        assert [c.kwargs["headers"] for c in get.call_args_list][-1] == {}
+        assert cache_file.read_text(encoding="utf-8") == updated
+    fetch_html.cache_clear()
+    print("✓ fetch_html caches, revalidates and recovers from a missing cache file")
+
+def test_fetch_html_charset_fallback():
+    """Pages without a usable declared charset are decoded by detection"""
+    page = "<html><body>最新資料截至 2025年10月31日 " + "基金表現 " * 40 + "</body></html>"
+    for content_type in ("text/html", "text/html; charset=ascii"):
+        url = f"https://example.invalid/{content_type}"
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(mpf_common, "CACHE_DIR", Path(tmp)), \
+                mock.patch.object(mpf_common._SESSION, "get") as get:
+            get.return_value = _response(200, page.encode("utf-8"), {"Content-Type": content_type})
+            fetch_html.cache_clear()
+            assert fetch_html(url) == page, f"Content-Type {content_type!r} was not decoded as UTF-8"
+    fetch_html.cache_clear()
+    print("✓ fetch_html detects the charset when it is missing or wrong")
+
+def test_load_dfs_bad_pickle():
+    """An unreadable cached pickle is re-parsed and overwritten"""
+    url = "https://example.invalid/eng/mpp_list.jsp"
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(mpf_common, "CACHE_DIR", Path(tmp)), \
+            mock.patch.object(mpf_common, "fetch_html", return_value=_FIXTURE_HTML):
+        cache_file = mpf_common._cache_path(url, ".pkl")
+        cache_file.write_bytes(b"\x80\x05truncated")
+        
+        load_dfs.cache_clear()
+        dfs = load_dfs(url)
+        assert [df.shape for df in dfs] == [(1, 2), (3, 17)], f"Unexpected tables: {[df.shape for df in dfs]}"
+        assert [df.shape for df in pd.read_pickle(cache_file)] == [(1, 2), (3, 17)], "Pickle should be rewritten"
+    load_dfs.cache_clear()
+    print("✓ load_dfs recovers from an unreadable cached pickle")
+
+if __name__ == "__main__":
+    test_main_table_header()
+    test_parse_main_table_csv()
+    test_parse_main_table_json()
+    test_extract_update_date()
+    test_fetch_html_cache()
+    test_fetch_html_charset_fallback()
+    test_load_dfs_bad_pickle()